@@ -117,17 +117,19 @@ class ColorizedLogger:
             file_handler.setFormatter(logging.Formatter(log_format))
             self.logger.addHandler(file_handler)
 
-    def debug(self, msg: str) -> None:
-        self.logger.debug(msg)
+    # The arguments are merged into the message with the % operator, like in the logging module, only if the message
+    # is going to be emitted, so messages filtered out by the level don't pay for the formatting.
+    def debug(self, msg: str, *args) -> None:
+        self.logger.debug(msg, *args)
 
-    def info(self, msg: str) -> None:
-        self.logger.info(msg)
+    def info(self, msg: str, *args) -> None:
+        self.logger.info(msg, *args)
 
-    def warning(self, msg: str) -> None:
-        self.logger.warning(msg)
+    def warning(self, msg: str, *args) -> None:
+        self.logger.warning(msg, *args)
 
-    def error(self, msg: str) -> None:
-        self.logger.error(msg)
+    def error(self, msg: str, *args) -> None:
+        self.logger.error(msg, *args)
 
-    def critical(self, msg: str) -> None:
-        self.logger.critical(msg)
+    def critical(self, msg: str, *args) -> None:
+        self.logger.critical(msg, *args)
@@ -7,7 +7,7 @@ from pathlib import Path
 import argcomplete
 
 from ros_project_creator.ros_project_creator import RosProjectCreator, RosProjectCreatorException
-from ros_project_creator.utilities import Utilities
+from ros_project_creator.utilities import RESOURCES_DIR, ROS_VARIANTS_YAML_FILE, Utilities
 
 
 def main():
@@ -15,11 +15,8 @@ def main():
         if os.geteuid() == 0:
             raise RuntimeError('ERROR: This script must not be run with sudo or as root')
 
-        resources_dir = Path(__file__).parent.joinpath('resources')
-        ros_variants = Utilities.load_yaml(resources_dir.joinpath('ros', 'ros_variants.yaml'))
-        Utilities.assert_non_empty(
-            ros_variants, f"No ROS variants found in the resource path '{resources_dir.resolve()}'"
-        )
+        ros_variants = Utilities.load_yaml(ROS_VARIANTS_YAML_FILE)
+        Utilities.assert_non_empty(ros_variants, f"No ROS variants found in the resource path '{RESOURCES_DIR}'")
         supported_ros_distros = ', '.join(
             f'{ros_distro} (ros{data["ros_version"]})' for ros_distro, data in ros_variants.items()
         )
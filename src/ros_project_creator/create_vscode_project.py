@@ -2,11 +2,11 @@
 import argparse
 import os
 import sys
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 
 import argcomplete
 
-from ros_project_creator.utilities import Utilities
+from ros_project_creator.utilities import RESOURCES_DIR, ROS_VARIANTS_YAML_FILE, Utilities
 from ros_project_creator.vscode_project_creator import (
     VscodeProjectCreator,
     VscodeProjectCreatorException,
@@ -18,11 +18,8 @@ def main():
         if os.geteuid() == 0:
             raise RuntimeError('ERROR: This script must not be run with sudo or as root')
 
-        resources_path = Path(__file__).parent.joinpath('resources')
-        ros_variants = Utilities.load_yaml(resources_path.joinpath('ros', 'ros_variants.yaml'))
-        Utilities.assert_non_empty(
-            ros_variants, f"No ROS variants found in the resource path '{resources_path.resolve()}'"
-        )
+        ros_variants = Utilities.load_yaml(ROS_VARIANTS_YAML_FILE)
+        Utilities.assert_non_empty(ros_variants, f"No ROS variants found in the resource path '{RESOURCES_DIR}'")
         supported_ros_distros = ', '.join(
             f'{ros_distro} (ros{data["ros_version"]})' for ros_distro, data in ros_variants.items()
         )
@@ -81,7 +78,7 @@ def main():
             else:
                 img_user_home_str = f'/home/{img_user}'
 
-        img_user_home_path = Path(img_user_home_str)
+        img_user_home_path = PurePosixPath(img_user_home_str)
         if not img_user_home_path.is_absolute():
             raise RuntimeError("Image user home path must be an absolute path")
 
@@ -92,7 +89,7 @@ def main():
             img_user,  # already cleaned
             img_user_home_path,
             Path(Utilities.clean_str(args.workspace_dir)),  # type: ignore
-            Path(Utilities.clean_str(args.img_workspace_dir)),  # type: ignore
+            PurePosixPath(Utilities.clean_str(args.img_workspace_dir)),  # type: ignore
             args.use_host_nvidia_driver,
             not args.no_console_log,  # parameter is used_console_log, so it is inverted # type: ignore
             args.log_file,
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+import os
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+# Upper bound of the threads used to install the files of a project.
+_MAX_INSTALL_WORKERS = 8
+
+# Items installed by the project creators. Every item is paired with the path it is installed to, relative to the
+# project directory, and the source paths are relative to the resources directory.
+
+
+@dataclass(frozen=True)
+class CopyDir:
+    """A directory copied recursively from src, or created empty if src is None."""
+
+    __slots__ = ('src',)
+
+    src: Optional[str]
+
+
+@dataclass(frozen=True)
+class CopyFile:
+    """A file copied from src, or created empty if src is None, with executable permissions or not."""
+
+    __slots__ = ('src', 'executable')
+
+    src: Optional[str]
+    executable: bool
+
+
+@dataclass(frozen=True)
+class RenderTemplate:
+    """
+    A file rendered from the template src with the given context, with executable permissions or not.
+
+    Templates with the '.j2' suffix are rendered with Jinja2, templates with the '.tmpl' suffix only have @name@
+    placeholders.
+    """
+
+    __slots__ = ('src', 'context', 'executable')
+
+    src: str
+    context: dict
+    executable: bool
+
+
+def install_concurrently(file_tasks: List[Tuple[Callable[..., None], ...]]) -> None:
+    """
+    Runs the given install tasks concurrently and waits for them to finish.
+
+    Each task is a tuple whose first element is the function that installs a file and whose remaining elements are its
+    arguments. The tasks must be independent from each other, e.g. their parent directories must already exist.
+
+    Args:
+        file_tasks (List[Tuple[Callable[..., None], ...]]): The tasks to run.
+    Raises:
+        Exception: The first exception raised by a task, in the order the tasks were given. The tasks not started yet
+            are cancelled.
+    """
+    # Copying a file and rendering a template are dominated by I/O, which releases the GIL. The files are small, so a
+    # few workers are enough to overlap the I/O latency, and more threads would only add start-up cost.
+    max_workers = max(1, min(_MAX_INSTALL_WORKERS, os.cpu_count() or 1, len(file_tasks)))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(handler, *args) for handler, *args in file_tasks]
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+
+        for future in not_done:
+            future.cancel()
+
+    # Re-raise the first failure, if any, in the order the items were submitted.
+    for future in futures:
+        if future in done:
+            future.result()
@@ -1,18 +1,60 @@
 #!/usr/bin/env python3
 
+import functools
 import os
-import pwd
 import shutil
+import stat
+import string
 import subprocess
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 from typing import Optional
 
-from jinja2 import Environment, FileSystemLoader
-
 from ros_project_creator.colorizedlogs import ColorizedLogger
+from ros_project_creator.install_items import CopyDir, CopyFile, RenderTemplate, install_concurrently
 from ros_project_creator.ros_variant import RosVariant
-from ros_project_creator.utilities import Utilities
-from ros_project_creator.vscode_project_creator import VscodeProjectCreator
+from ros_project_creator.utilities import RESOURCES_DIR, ROS_VARIANTS_YAML_FILE, Utilities
+
+
+class _TmplTemplate(string.Template):
+    # The placeholders are @name@, as in CMake's configure_file(), so they don't clash with CMake's own ${VAR}
+    # references, which are left untouched. Any other '@' is left untouched too.
+    delimiter = '@'
+    pattern = r"""
+    @(?:
+      (?P<named>[_a-z][_a-z0-9]*)@ |
+      (?P<escaped>(?!)) |
+      (?P<braced>(?!)) |
+      (?P<invalid>(?!))
+    )
+    """
+
+
+def _render_template(templates_dir: str, template_name: str, context: dict) -> str:
+    # Templates with the '.tmpl' suffix have no control flow, only @name@ placeholders, so they are rendered with a
+    # single regex substitution pass instead of going through the Jinja2 lexer, parser and compiler. As with the
+    # StrictUndefined of the Jinja2 templates, a placeholder missing from the context is an error.
+    if template_name.endswith('.tmpl'):
+        template = _TmplTemplate(Path(templates_dir, template_name).read_text(encoding='utf-8'))
+
+        try:
+            text = template.substitute(context)
+        except KeyError as e:
+            raise RosProjectCreatorException(
+                f"Variable '{e.args[0]}' of template '{template_name}' is missing from the context."
+            ) from None
+
+        # Jinja2 drops the trailing newline of a template, do the same so all rendered files end the same way.
+        return text[:-1] if text.endswith('\n') else text
+
+    return Utilities.get_jinja_env(templates_dir).get_template(template_name).render(context)
+
+
+# The rendered text only depends on the template and on the context, so when the same template is rendered with the
+# same context again (e.g. several projects created in the same process) the previous result is returned. The context
+# is passed as a tuple of sorted (key, value) pairs to make it hashable.
+@functools.lru_cache(maxsize=128)
+def _render_template_cached(templates_dir: str, template_name: str, context_items: tuple) -> str:
+    return _render_template(templates_dir, template_name, dict(context_items))
 
 
 class RosProjectCreatorException(Exception):
@@ -26,6 +68,50 @@ class RosProjectCreator:
     Class to create a ROS project with various configurations and checks.
     """
 
+    # ==========================================================================
+    # static private methods
+    # ==========================================================================
+
+    # The resource files ship with the package and don't change while the process runs, so each one is read and
+    # decoded only once, even when several projects are created in the same process.
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _read_resource(path_str: str) -> str:
+        return Utilities.read_file(Path(path_str))
+
+    # The user database lookup may go through NSS (e.g. LDAP or SSSD), which can be slow, and the invoking user
+    # doesn't change while the process runs, so the home of each user is looked up only once.
+    @staticmethod
+    @functools.lru_cache(maxsize=4)
+    def _user_home(user: str) -> Path:
+        # Imported here, as the rest of the lazy imports in this module, to keep the startup of the command line
+        # tools fast when no project is created (e.g. when only the help message is requested).
+        import pwd
+
+        return Path(pwd.getpwnam(user).pw_dir).resolve()
+
+    # Looking up a binary walks the whole PATH, so it is done once per process. The absolute path is then passed to
+    # subprocess, which spares it the same search. A failed lookup raises, so it isn't cached.
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _git_path() -> str:
+        git_path = shutil.which('git')
+
+        if not git_path:
+            raise RosProjectCreatorException('Git binary not found in the system')
+
+        return git_path
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _pre_commit_path() -> str:
+        pre_commit_path = shutil.which('pre-commit')
+
+        if not pre_commit_path:
+            raise RosProjectCreatorException('pre-commit binary not found in the system')
+
+        return pre_commit_path
+
     # ==========================================================================
     # non-static private methods
     # ==========================================================================
@@ -102,7 +188,7 @@ class RosProjectCreator:
             if not real_user:
                 raise RosProjectCreatorException('Unable to determine the active user')
 
-            user_home = Path(pwd.getpwnam(real_user).pw_dir).resolve()
+            user_home = self._user_home(real_user)
 
             # Ensure project_dir is inside the user's home.
             try:
@@ -122,11 +208,10 @@ class RosProjectCreator:
                     f'Remove it manually or choose a different project directory.'
                 )
 
-            self._resources_dir = Path(__file__).parent.joinpath('resources')
-            Utilities.assert_dir_existence(self._resources_dir, f"Path '{self._resources_dir.resolve()}' is required")
+            self._resources_dir = RESOURCES_DIR
+            Utilities.assert_dir_existence(self._resources_dir, f"Path '{self._resources_dir}' is required")
 
-            ros_variant_yaml_file = self._resources_dir.joinpath('ros', 'ros_variants.yaml')
-            self._ros_variant = RosVariant(ros_distro, ros_variant_yaml_file)
+            self._ros_variant = RosVariant(ros_distro, ROS_VARIANTS_YAML_FILE)
 
             self._base_img = Utilities.clean_str(base_img)
             Utilities.assert_non_empty(self._base_img, 'Base image must be a non-empty string')
@@ -145,9 +230,9 @@ class RosProjectCreator:
                 raise RosProjectCreatorException('Image user must not contain spaces')
 
             if self._img_user == 'root':
-                self._img_user_home = Path(f'/{self._img_user}')
+                self._img_user_home = PurePosixPath(f'/{self._img_user}')
             else:
-                self._img_user_home = Path(f'/home/{self._img_user}')
+                self._img_user_home = PurePosixPath(f'/home/{self._img_user}')
 
             self._img_workspace_dir = self._img_user_home.joinpath('workspace')
             self._img_datasets_dir = self._img_user_home.joinpath('datasets')
@@ -168,21 +253,23 @@ class RosProjectCreator:
             self._use_host_nvidia_driver = use_host_nvidia_driver
 
             # Check if the git binary exists in the system.
-            self._check_git_binary_existance()
+            self._git_path()
 
             # If the pre-commit argument is True, check if the pre-commit binary exists in the
             # system.
             self._use_pre_commit = use_pre_commit
 
             if self._use_pre_commit:
-                self._check_pre_commit_binary_existance()
+                self._pre_commit_path()
 
-            self._logger.info(f"Creating project '{self._project_id}'")
+            self._logger.info("Creating project '%s'", self._project_id)
 
             self._install_items()
 
             # Create VSCode project if requested.
             if use_vscode_project:
+                from ros_project_creator.vscode_project_creator import VscodeProjectCreator
+
                 self._vscode_project_creator = VscodeProjectCreator(
                     self._project_id,
                     self._ros_variant.get_distro(),
@@ -202,226 +289,222 @@ class RosProjectCreator:
             if use_pre_commit:
                 self._logger.info(self._install_pre_commit_config())
         except RosProjectCreatorException as e:
-            self._logger.error(f'{e}')
+            self._logger.error('%s', e)
             raise
 
-    def _check_git_binary_existance(self) -> None:
-        # Check git binary existence.
-        if not shutil.which('git'):
-            raise RosProjectCreatorException('Git binary not found in the system')
+    def _assert_non_empty_resource_file(self, file: Path) -> None:
+        # A single stat() tells whether the file exists, whether it is a regular file and whether it has content.
+        try:
+            file_stat = os.stat(file)
+        except FileNotFoundError:
+            raise RosProjectCreatorException(f"File '{str(file)}' not found") from None
 
-    def _check_pre_commit_binary_existance(self) -> None:
-        # Check pre-commit binary existence.
-        if not shutil.which('pre-commit'):
-            raise RosProjectCreatorException('pre-commit binary not found in the system')
+        if not stat.S_ISREG(file_stat.st_mode):
+            raise RosProjectCreatorException(f"Path '{str(file)}' is not a file")
+
+        if file_stat.st_size == 0:
+            raise RosProjectCreatorException(f"File '{str(file)}' is empty")
 
     def _create_items_to_install(self) -> None:
-        docker_dir = self._project_dir.joinpath('docker')
+        # Values used by several of the items below, read once.
+        ros_distro = self._ros_variant.get_distro()
+        ros_version = self._ros_variant.get_version()
+        c_version = self._ros_variant.get_c_version()
+        cpp_version = self._ros_variant.get_cpp_version()
 
         # Relative path to the build script from the project directory.
-        relative_build_script = Path('docker/build.py')
-        # Path to the build script.
-        build_script = self._project_dir.joinpath(relative_build_script)
-
+        relative_build_script = 'docker/build.py'
         # Relative path to the deps file from the project directory.
-        relative_deps_file = Path('deps.repos')
-        # Path to the deps file.
-        deps_file = self._project_dir.joinpath(relative_deps_file)
-
-        # Path where the dependency packages will be installed.
-        relative_deps_targer_dir = Path('src/0_deps')
-        deps_target_dir = self._project_dir.joinpath(relative_deps_targer_dir)
+        relative_deps_file = 'deps.repos'
+        # Relative path to the directory where the dependency packages will be installed, from the project directory.
+        relative_deps_target_dir = 'src/0_deps'
 
+        # Relative paths used by the build script to locate the rest of the project. The build script resolves them
+        # against its own path (not its parent directory), so '..' is 'docker' and '../..' is the project directory.
+        # They only depend on the layout above, so they are written out instead of computed with os.path.relpath().
         # The context directory is the project directory.
-        relpath_to_context_dir_from_build_script = os.path.relpath(str(self._project_dir), str(build_script))
-        relpath_to_docker_dir_from_build_script = os.path.relpath(str(docker_dir), str(build_script))
-        relpath_to_deps_file_from_build_script = os.path.relpath(str(deps_file), str(build_script))
-        relpath_to_deps_target_dir_from_build_script = os.path.relpath(str(deps_target_dir), str(build_script))
-
-        ros_packages_file = self._resources_dir.joinpath(f'ros/packages_ros{self._ros_variant.get_version()}.txt')
-        Utilities.assert_file_existence(ros_packages_file, f"File '{str(ros_packages_file)}' not found")
-        ros_packages = Utilities.read_file(ros_packages_file)
+        relpath_to_context_dir_from_build_script = '../..'
+        relpath_to_docker_dir_from_build_script = '..'
+        relpath_to_deps_file_from_build_script = f'../../{relative_deps_file}'
+        relpath_to_deps_target_dir_from_build_script = f'../../{relative_deps_target_dir}'
 
-        if not ros_packages.strip():
-            raise RosProjectCreatorException(f"File '{str(ros_packages_file)}' is empty.")
+        ros_packages_file = self._resources_dir.joinpath(f'ros/packages_ros{ros_version}.txt')
+        # The content of the file is only read when the context for the install_ros template is built.
+        self._assert_non_empty_resource_file(ros_packages_file)
 
-        if self._ros_variant.get_version() == 1:
+        if ros_version == 1:
             extra_ros_env_vars_file = self._resources_dir.joinpath('ros/env_vars_ros1.txt')
-            Utilities.assert_file_existence(extra_ros_env_vars_file, f"File '{str(extra_ros_env_vars_file)}' not found")
-            extra_ros_env_vars = Utilities.read_file(extra_ros_env_vars_file)
-
-            if not extra_ros_env_vars.strip():
-                raise RosProjectCreatorException(f"File '{str(extra_ros_env_vars_file)}' is empty")
+            self._assert_non_empty_resource_file(extra_ros_env_vars_file)
+            extra_ros_env_vars = self._read_resource(str(extra_ros_env_vars_file))
         else:
             extra_ros_env_vars_file = self._resources_dir.joinpath('ros/env_vars_ros2.j2')
             Utilities.assert_file_existence(extra_ros_env_vars_file, f"File '{str(extra_ros_env_vars_file)}' not found")
-            jinja2_env = Environment(
-                loader=FileSystemLoader(extra_ros_env_vars_file.parent), trim_blocks=True, lstrip_blocks=True
+            # Rendered through the same shared environment and result cache as the rest of templates.
+            extra_ros_env_vars = _render_template_cached(
+                str(self._resources_dir), 'ros/env_vars_ros2.j2', (('ros_distro', ros_distro),)
             )
-            jinja2_template = jinja2_env.get_template(extra_ros_env_vars_file.name)
-            extra_ros_env_vars = jinja2_template.render({'ros_distro': self._ros_variant.get_distro()})
-
-        # By using a dictionary we can sort the keys and create the files in a specific order,
-        # because the key is the file to create, relative to the project directory.
-
-        # The value is a list:
-        # If the list has one element, the key represents a directory to be 'created' somehow.
-        #    If the first element of the list is not None, then this element is a directory to be
-        #    copied in the path specified by the key.
-        #    If the first element of the list is None, then the key is a directory to be created.
-        #
-        # If the list has two elements, the key represents a file to be 'created' somehow.
-        #    If the first element of the list is not None, then this element is a file to be
-        #    copied in the path specified by the key. The second element of the list is a boolean
-        #    indicating if the file should be created with executable permissions (T) or not (F).
-        #    If the first element of the list is None, then the key is a file to be created, and the
-        #    second element of the list is a boolean indicating if the file should be created with
-        #    executable permissions (T) or not (F).
-        #
-        # If the list has three elements, the key represents a file to be 'created' with Jinja2
-        # rendering. The first element of the list is the source file path, which is a Jinja2
-        # template. The second element is a dictionary with the context for Jinja2 rendering.
-        # The third element is a boolean indicating if the file should be created with executable
-        # permissions (True) or not (False).
-
-        #  with the source file path, the context for Jinja2 rendering (if any), and the file
-        # permissions.
-        # The source file path is relative to the resources directory.
-        # The context is a dictionary with the variables to be replaced in the Jinja2 template.
-        # The third element is a boolean indicating if the file should be created with executable
-        # permissions (True) or not (False).
-
-        self._items_to_install = {
-            '.gitignore': ['git/dot_gitignore', False],
-            '.gitlab': ['git/gitlab'],
-            f'{str(relative_deps_file)}': ['deps/deps.repos', False],
-            'docker/.resources/deduplicate_path.sh': ['scripts/deduplicate_path.sh', True],
-            'docker/.resources/dot_bash_aliases.sh': ['scripts/dot_bash_aliases', True],
-            'docker/.resources/install_base_system.sh': ['scripts/install_base_system.sh', True],
-            'docker/.resources/install_ros.sh': [
-                'ros/install_ros.j2',
-                {'use_environment': self._use_environment, 'ros_packages': ros_packages},
-                True,
-            ],
-            'docker/.resources/rosbuild.sh': [f'ros/ros{self._ros_variant.get_version()}build.sh', True],
-            'docker/.resources/rosdep_init_update.sh': ['ros/rosdep_init_update.sh', True],
-            'docker/Dockerfile': [
-                'docker/Dockerfile.j2',
-                {
-                    'base_img': self._base_img,
-                    'img_user': self._img_user,
-                    'img_user_home': str(self._img_user_home),
-                    'ros_distro': self._ros_variant.get_distro(),
-                    'ros_version': self._ros_variant.get_version(),
-                    'use_host_nvidia_driver': self._use_host_nvidia_driver,
-                    'use_base_img_entrypoint': self._use_base_img_entrypoint,
-                    'use_environment': self._use_environment,
-                    'extra_ros_env_vars': extra_ros_env_vars,
-                },
-                False,
-            ],
-            str(relative_build_script): [
-                'docker/build.j2',
-                {
-                    'description': f"Builds the Docker image '{self._img_id}' for the project '{self._project_id}', using the base image '{self._base_img}', with active user '{self._img_user}' and 'ROS{self._ros_variant.get_version()}-{self._ros_variant.get_distro()}'",
-                    'project_id': self._project_id,
-                    'relpath_to_docker_dir': relpath_to_docker_dir_from_build_script,
-                    'relpath_to_context_dir': relpath_to_context_dir_from_build_script,
-                    'base_img': self._base_img,
-                    'img_user': self._img_user,
-                    'img_id': self._img_id,
-                    'ros_distro': self._ros_variant.get_distro(),
-                    'ros_version': self._ros_variant.get_version(),
-                    'deps_file': relpath_to_deps_file_from_build_script,
-                    'deps_target_dir': relpath_to_deps_target_dir_from_build_script,
-                },
-                True,
-            ],
-            'docker/docker-compose.yaml': [
-                'docker/docker-compose.j2',
-                {
-                    'service': 'appcont',
-                    'img_id': self._img_id,
-                    'use_host_nvidia_driver': self._use_host_nvidia_driver,
-                    'workspace_dir': f'~/workspaces/{self._project_id}',
-                    'img_workspace_dir': str(self._img_workspace_dir),
-                    'img_datasets_dir': str(self._img_datasets_dir),
-                    'img_ssh_dir': str(self._img_ssh_dir),
-                    'use_git': False,
-                    'ext_uid': '1000',
-                    'ext_upgid': '1000',
-                    'ros_version': self._ros_variant.get_version(),
-                    'ros_distro': self._ros_variant.get_distro(),
-                },
-                False,
-            ],
-            'docker/dockerignore': ['docker/dot_dockerignore', False],
-            'install_deps.sh': ['deps/install_deps.sh', True],
-            'pyproject.toml': ['pyproject.toml', False],
-            'README.md': ['README.j2', {'project_id': self._project_id}, False],
-            'src/.clang-format': ['clang/dot_clang-format', False],
-            'src/.clang-tidy': ['clang/dot_clang-tidy', False],
-            str(relative_deps_targer_dir): [None],
-            'src/bringup/CMakeLists.txt': [
-                f'ros/bringup_CMakeLists_ros{self._ros_variant.get_version()}.j2',
-                {'c_version': self._ros_variant.get_c_version(), 'cpp_version': self._ros_variant.get_cpp_version()},
-                False,
-            ],
-            'src/bringup/config': [None],
-            'src/bringup/launch': [None],
-            'src/bringup/package.xml': [f'ros/bringup_package_ros{self._ros_variant.get_version()}.xml', False],
-            'src/bringup/rviz': [None],
-            'src/bringup/scripts': [None],
-            'src/simulation/CMakeLists.txt': [
-                f'ros/simulation_CMakeLists_ros{self._ros_variant.get_version()}.j2',
-                {'c_version': self._ros_variant.get_c_version(), 'cpp_version': self._ros_variant.get_cpp_version()},
-                False,
-            ],
-            'src/simulation/config': [None],
-            'src/simulation/launch': [None],
-            'src/simulation/package.xml': [f'ros/simulation_package_ros{self._ros_variant.get_version()}.xml', False],
-            'src/simulation/rviz': [None],
-            'src/simulation/scripts': [None],
-        }
+
+        # The items are listed in the order they are created. Each item is a tuple whose first element is the path
+        # to create, relative to the project directory, and whose second element describes how to create it:
+        #   CopyDir        -> a directory, copied from a resource or created empty.
+        #   CopyFile       -> a file, copied from a resource or created empty, with or without executable permissions.
+        #   RenderTemplate -> a file rendered from a template, with or without executable permissions.
+        # A directory item must be listed before any item inside it.
+
+        self._items_to_install = [
+            ('.gitignore', CopyFile('git/dot_gitignore', False)),
+            ('.gitlab', CopyDir('git/gitlab')),
+            (relative_deps_file, CopyFile('deps/deps.repos', False)),
+            ('docker/.resources/deduplicate_path.sh', CopyFile('scripts/deduplicate_path.sh', True)),
+            ('docker/.resources/dot_bash_aliases.sh', CopyFile('scripts/dot_bash_aliases', True)),
+            ('docker/.resources/install_base_system.sh', CopyFile('scripts/install_base_system.sh', True)),
+            (
+                'docker/.resources/install_ros.sh',
+                RenderTemplate(
+                    'ros/install_ros.j2',
+                    {
+                        'use_environment': self._use_environment,
+                        'ros_packages': self._read_resource(str(ros_packages_file)),
+                    },
+                    True,
+                ),
+            ),
+            ('docker/.resources/rosbuild.sh', CopyFile(f'ros/ros{ros_version}build.sh', True)),
+            ('docker/.resources/rosdep_init_update.sh', CopyFile('ros/rosdep_init_update.sh', True)),
+            (
+                'docker/Dockerfile',
+                RenderTemplate(
+                    'docker/Dockerfile.j2',
+                    {
+                        'base_img': self._base_img,
+                        'img_user': self._img_user,
+                        'img_user_home': str(self._img_user_home),
+                        'ros_distro': ros_distro,
+                        'ros_version': ros_version,
+                        'use_host_nvidia_driver': self._use_host_nvidia_driver,
+                        'use_base_img_entrypoint': self._use_base_img_entrypoint,
+                        'use_environment': self._use_environment,
+                        'extra_ros_env_vars': extra_ros_env_vars,
+                    },
+                    False,
+                ),
+            ),
+            (
+                relative_build_script,
+                RenderTemplate(
+                    'docker/build.j2',
+                    {
+                        'description': f"Builds the Docker image '{self._img_id}' for the project '{self._project_id}', using the base image '{self._base_img}', with active user '{self._img_user}' and 'ROS{ros_version}-{ros_distro}'",
+                        'project_id': self._project_id,
+                        'relpath_to_docker_dir': relpath_to_docker_dir_from_build_script,
+                        'relpath_to_context_dir': relpath_to_context_dir_from_build_script,
+                        'base_img': self._base_img,
+                        'img_user': self._img_user,
+                        'img_id': self._img_id,
+                        'ros_distro': ros_distro,
+                        'ros_version': ros_version,
+                        'deps_file': relpath_to_deps_file_from_build_script,
+                        'deps_target_dir': relpath_to_deps_target_dir_from_build_script,
+                    },
+                    True,
+                ),
+            ),
+            (
+                'docker/docker-compose.yaml',
+                RenderTemplate(
+                    'docker/docker-compose.j2',
+                    {
+                        'service': 'appcont',
+                        'img_id': self._img_id,
+                        'use_host_nvidia_driver': self._use_host_nvidia_driver,
+                        'workspace_dir': f'~/workspaces/{self._project_id}',
+                        'img_workspace_dir': str(self._img_workspace_dir),
+                        'img_datasets_dir': str(self._img_datasets_dir),
+                        'img_ssh_dir': str(self._img_ssh_dir),
+                        'use_git': False,
+                        'ext_uid': '1000',
+                        'ext_upgid': '1000',
+                        'ros_version': ros_version,
+                        'ros_distro': ros_distro,
+                    },
+                    False,
+                ),
+            ),
+            ('docker/dockerignore', CopyFile('docker/dot_dockerignore', False)),
+            ('install_deps.sh', CopyFile('deps/install_deps.sh', True)),
+            ('pyproject.toml', CopyFile('pyproject.toml', False)),
+            ('README.md', RenderTemplate('README.tmpl', {'project_id': self._project_id}, False)),
+            ('src/.clang-format', CopyFile('clang/dot_clang-format', False)),
+            ('src/.clang-tidy', CopyFile('clang/dot_clang-tidy', False)),
+            (relative_deps_target_dir, CopyDir(None)),
+            (
+                'src/bringup/CMakeLists.txt',
+                RenderTemplate(
+                    f'ros/bringup_CMakeLists_ros{ros_version}.tmpl',
+                    {'c_version': c_version, 'cpp_version': cpp_version},
+                    False,
+                ),
+            ),
+            ('src/bringup/config', CopyDir(None)),
+            ('src/bringup/launch', CopyDir(None)),
+            ('src/bringup/package.xml', CopyFile(f'ros/bringup_package_ros{ros_version}.xml', False)),
+            ('src/bringup/rviz', CopyDir(None)),
+            ('src/bringup/scripts', CopyDir(None)),
+            (
+                'src/simulation/CMakeLists.txt',
+                RenderTemplate(
+                    f'ros/simulation_CMakeLists_ros{ros_version}.tmpl',
+                    {'c_version': c_version, 'cpp_version': cpp_version},
+                    False,
+                ),
+            ),
+            ('src/simulation/config', CopyDir(None)),
+            ('src/simulation/launch', CopyDir(None)),
+            ('src/simulation/package.xml', CopyFile(f'ros/simulation_package_ros{ros_version}.xml', False)),
+            ('src/simulation/rviz', CopyDir(None)),
+            ('src/simulation/scripts', CopyDir(None)),
+        ]
 
         if self._use_pre_commit:
-            self._items_to_install['.pre-commit-config.yaml'] = ['git/dot_pre-commit-config.yaml', False]
+            self._items_to_install.append(
+                ('.pre-commit-config.yaml', CopyFile('git/dot_pre-commit-config.yaml', False))
+            )
 
-        if self._ros_variant.get_version() == 1:
-            self._items_to_install['.catkin_tools/profiles/default/config.yaml'] = [
-                'ros/catkin_config_ros1.yaml',
-                False,
-            ]
+        if ros_version == 1:
+            self._items_to_install.append(
+                ('.catkin_tools/profiles/default/config.yaml', CopyFile('ros/catkin_config_ros1.yaml', False))
+            )
         else:
-            self._items_to_install['docker/.resources/rosdep_ignored_keys.yaml'] = [
-                'ros/rosdep_ignored_keys_ros2.yaml',
-                False,
-            ]
-            self._items_to_install['docker/.resources/colcon_mixin_metadata.sh'] = [
-                'ros/colcon_mixin_metadata.sh',
-                True,
-            ]
+            self._items_to_install.append(
+                ('docker/.resources/rosdep_ignored_keys.yaml', CopyFile('ros/rosdep_ignored_keys_ros2.yaml', False))
+            )
+            self._items_to_install.append(
+                ('docker/.resources/colcon_mixin_metadata.sh', CopyFile('ros/colcon_mixin_metadata.sh', True))
+            )
 
         if not self._use_base_img_entrypoint:
-            self._items_to_install['docker/entrypoint.sh'] = ['docker/entrypoint.sh', True]
+            self._items_to_install.append(('docker/entrypoint.sh', CopyFile('docker/entrypoint.sh', True)))
 
         if self._use_environment:
-            self._items_to_install['docker/.resources/environment.sh'] = [
-                f'ros/environment_ros{self._ros_variant.get_version()}.j2',
-                {'ros_distro': self._ros_variant.get_distro()},
-                True,
-            ]
+            self._items_to_install.append(
+                (
+                    'docker/.resources/environment.sh',
+                    RenderTemplate(f'ros/environment_ros{ros_version}.j2', {'ros_distro': ros_distro}, True),
+                )
+            )
 
         if not self._use_host_nvidia_driver:
-            self._items_to_install['docker/.resources/install_mesa_packages.sh'] = [
-                'scripts/install_default_mesa_packages.sh',
-                True,
-            ]
+            self._items_to_install.append(
+                (
+                    'docker/.resources/install_mesa_packages.sh',
+                    CopyFile('scripts/install_default_mesa_packages.sh', True),
+                )
+            )
 
     def _initializate_git_repo(self) -> str:
-        cmd = ['git', 'init', '--initial-branch=main']
+        cmd = [self._git_path(), 'init', '--initial-branch=main']
         cwd = self._project_dir
-        self._logger.info(f"Executing command '{' '.join(cmd)}' in '{cwd}'")
+        self._logger.info("Executing command '%s' in '%s'", ' '.join(cmd), cwd)
         result = subprocess.run(
             cmd,
             cwd=str(cwd),  # Convert Path to string
@@ -429,111 +512,87 @@ class RosProjectCreator:
             stderr=subprocess.PIPE,  # Capture standard error output to handle errors programmatically
             text=True,  # Convert output from bytes to a string for easier processing
             check=True,  # Raise a CalledProcessError exception if the command fails (non-zero exit code)
+            close_fds=False,  # No descriptor needs to be hidden from git, so skip closing them in the child
         )
 
         return result.stdout.strip()  # Return the output of the command, removing any leading/trailing whitespace
 
-    def _install_items(self) -> None:
-        self._create_items_to_install()
+    def _install_dir(self, dst_path: Path, src_path: Optional[Path], item: CopyDir) -> None:
+        self._logger.info("Creating directory '%s'", dst_path)
 
-        for key in sorted(self._items_to_install.keys()):
-            dst_path = self._project_dir.joinpath(key).resolve()
+        # src_path is None -> create an empty directory
+        # src_path is not None -> copy the directory recursively
+        if src_path is not None:
+            Utilities.copy_dir(src_path, dst_path, 0o775)
+        else:
+            dst_path.mkdir(parents=True)
 
-            item = self._items_to_install[key]
+    def _install_file(self, dst_path: Path, src_path: Optional[Path], item: CopyFile) -> None:
+        self._logger.info("Creating file '%s'", dst_path)
 
-            # If the item[0] is None, it means that the key, that can be a file or a directory, must
-            # be created, not copied from a resource.
-            src_path = None
+        mode = 0o775 if item.executable else 0o664
 
-            if item[0] is not None:
-                src_path = self._resources_dir.joinpath(item[0])
-
-                if not src_path.exists():
-                    raise RosProjectCreatorException(f"Required resource '{str(src_path)}' does not exist.")
-
-            # len = 1 -> directory
-            #    src_path is None -> create an empty directory
-            #    src_path is not None -> copy the directory recursively
-            # len = 2 -> file with permissions
-            #    src_path is None -> create an empty file with permissions
-            #    src_path is not None -> copy the file with permissions
-            # len = 3 -> file with Jinja2 rendering and permissions
-            #    src_path is None -> raise an exception, not allowed
-            #    src_path is not None -> copy the file with Jinja2 rendering and permissions
-            if len(item) == 1:
-                self._logger.info(f"Creating directory '{dst_path}'")
-
-                if src_path is not None:
-                    if not src_path.is_dir():
-                        raise RosProjectCreatorException(f"Required resource '{str(src_path)}' is not a directory.")
+        # src_path is None -> create an empty file with permissions
+        # src_path is not None -> copy the file with permissions
+        if src_path is not None:
+            Utilities.copy_file_fast(src_path, dst_path, mode)
+        else:
+            dst_path.touch()
+            dst_path.chmod(mode)
 
-                    if not dst_path.parent.exists():
-                        dst_path.parent.mkdir(parents=True)
+    def _install_items(self) -> None:
+        self._create_items_to_install()
 
-                    shutil.copytree(src_path, dst_path, copy_function=shutil.copy2)
-                    dst_path.chmod(0o775)
-                else:
-                    dst_path.mkdir(parents=True)
-            elif len(item) == 2:
-                self._logger.info(f"Creating file '{dst_path}'")
+        handlers = {CopyDir: self._install_dir, CopyFile: self._install_file, RenderTemplate: self._install_template}
 
-                if src_path is not None:
-                    if not src_path.is_file():
-                        raise RosProjectCreatorException(f"Required resource '{str(src_path)}' is not a file.")
+        # Directories are installed first, serially and in order, because the files may be installed inside them.
+        # The parent directories of the files are collected in this pass and created right after it, once each, so
+        # the files are then independent from each other and can be installed concurrently.
+        file_tasks = []
+        file_parent_dirs = set()
 
-                    if not dst_path.parent.exists():
-                        dst_path.parent.mkdir(parents=True)
+        for key, item in self._items_to_install:
+            # The project dir is already resolved and the keys are plain relative paths, without symlinks or '..'
+            # components, so the destination path doesn't need to be resolved.
+            dst_path = self._project_dir / key
 
-                    shutil.copy2(src_path, dst_path)
-                else:
-                    dst_path.touch()
+            # If the source is None, it means that the key, that can be a file or a directory, must
+            # be created, not copied from a resource.
+            src_path = None
 
-                if item[1]:
-                    dst_path.chmod(0o775)
-                else:
-                    dst_path.chmod(0o664)
-            elif len(item) == 3:
-                self._logger.info(f"Creating file '{dst_path}'")
+            if item.src is not None:
+                src_path = self._resources_dir.joinpath(item.src)
 
-                if src_path is None:
-                    raise RosProjectCreatorException(
-                        f"Relative source path can't be empty for element '{str(dst_path)}'."
-                    )
+                # A single stat() tells whether the resource exists and whether it is a directory or a file.
+                try:
+                    src_mode = os.stat(src_path).st_mode
+                except FileNotFoundError:
+                    raise RosProjectCreatorException(f"Required resource '{str(src_path)}' does not exist.") from None
 
-                if not src_path.is_file():
+                if isinstance(item, CopyDir):
+                    if not stat.S_ISDIR(src_mode):
+                        raise RosProjectCreatorException(f"Required resource '{str(src_path)}' is not a directory.")
+                elif not stat.S_ISREG(src_mode):
                     raise RosProjectCreatorException(f"Required resource '{str(src_path)}' is not a file.")
 
-                context = item[1]
-
-                if context is None:
-                    raise RosProjectCreatorException(
-                        f"Context for Jinja2 rendering can't be None for element '{str(dst_path)}'."
-                    )
+            handler = handlers[type(item)]
 
-                if not isinstance(context, dict):
-                    raise RosProjectCreatorException(
-                        f"Context for Jinja2 rendering must be a dictionary for element '{str(dst_path)}'."
-                    )
-
-                if not dst_path.parent.exists():
-                    dst_path.parent.mkdir(parents=True)
-
-                jinja2_env = Environment(loader=FileSystemLoader(src_path.parent), trim_blocks=True, lstrip_blocks=True)
-                jinja2_template = jinja2_env.get_template(src_path.name)
-                rendered_text = jinja2_template.render(context)
+            if isinstance(item, CopyDir):
+                handler(dst_path, src_path, item)
+            else:
+                file_parent_dirs.add(dst_path.parent)
+                file_tasks.append((handler, dst_path, src_path, item))
 
-                with dst_path.open('w') as f:
-                    f.write(rendered_text)
+        # Shallower directories first, so every makedirs() call only creates its last component.
+        for parent_dir in sorted(file_parent_dirs, key=lambda path: len(path.parts)):
+            os.makedirs(parent_dir, exist_ok=True)
 
-                if item[2]:
-                    dst_path.chmod(0o775)
-                else:
-                    dst_path.chmod(0o664)
+        install_concurrently(file_tasks)
 
     def _install_pre_commit_config(self) -> str:
-        cmd = ['pre-commit', 'install']
+        cmd = [self._pre_commit_path(), 'install']
         cwd = self._project_dir
-        self._logger.info(f"Executing command '{' '.join(cmd)}' in '{cwd}'...")
+        self._logger.info("Executing command '%s' in '%s'...", ' '.join(cmd), cwd)
         result = subprocess.run(
             cmd,
             cwd=str(cwd),  # set the working directory where the command will be executed
@@ -541,6 +600,38 @@ class RosProjectCreator:
             stderr=subprocess.PIPE,  # capture standard error output to handle errors programmatically
             text=True,  # convert output from bytes to a string for easier processing
             check=True,  # raise a calledprocesserror exception if the command fails (non-zero exit code)
+            close_fds=False,  # no descriptor needs to be hidden from pre-commit, so skip closing them in the child
         )
 
         return result.stdout.strip()  # return the output of the command, removing any leading/trailing whitespace
+
+    def _install_template(self, dst_path: Path, src_path: Optional[Path], item: RenderTemplate) -> None:
+        self._logger.info("Creating file '%s'", dst_path)
+
+        context_items = tuple(sorted(item.context.items()))
+
+        # Contexts holding unhashable values can't be used as cache keys, so they are rendered directly.
+        try:
+            hash(context_items)
+        except TypeError:
+            rendered_text = _render_template(str(self._resources_dir), item.src, item.context)
+        else:
+            rendered_text = _render_template_cached(str(self._resources_dir), item.src, context_items)
+
+        # The rendered text is written with a single raw write on a plain descriptor, without the text and buffered
+        # layers that open() stacks on top of it, which are of no use for one write. The file is created with the same
+        # permissions open() would give it.
+        data = memoryview(rendered_text.encode('utf-8'))
+        fd = os.open(dst_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+
+        try:
+            # A write to a regular file normally writes all the data at once, but it isn't guaranteed to.
+            while data:
+                data = data[os.write(fd, data) :]
+        finally:
+            os.close(fd)
+
+        if item.executable:
+            dst_path.chmod(0o775)
+        else:
+            dst_path.chmod(0o664)
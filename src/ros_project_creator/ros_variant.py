@@ -1,39 +1,68 @@
+from dataclasses import dataclass
 from pathlib import Path
 
 from ros_project_creator.utilities import Utilities
 
 
+@dataclass(frozen=True)
+class _Variant:
+    """Fields of a ROS variant, parsed once from its entry in the ROS variants file."""
+
+    __slots__ = ('ros_distro', 'ros_version', 'ubuntu_version', 'python_version', 'c_version', 'cpp_version')
+
+    ros_distro: str
+    ros_version: int
+    ubuntu_version: str
+    python_version: str
+    c_version: str
+    cpp_version: str
+
+
 class RosVariant:
 
     def __init__(self, ros_distro: str, ros_variants_yaml_file: Path):
         ros_distro = Utilities.clean_str(ros_distro)
         Utilities.assert_non_empty(ros_distro, "ROS distro must be a non-empty string")
 
-        Utilities.assert_file_existence(
-            ros_variants_yaml_file, f"File '{ros_variants_yaml_file.resolve()}' is required"
-        )
+        Utilities.assert_file_existence(ros_variants_yaml_file, f"File '{ros_variants_yaml_file}' is required")
 
         # Check if the ros_distro provided by the user is supported by the configuration provided in the resources.
+        # Utilities.load_yaml caches the parsed file, so it is only parsed once per process (e.g. the command line tools
+        # already load it to list the supported distros).
         ros_variants = Utilities.load_yaml(ros_variants_yaml_file)
-        Utilities.assert_non_empty(
-            ros_variants, f"No ROS variants found in the file '{ros_variants_yaml_file.resolve()}'"
-        )
+        Utilities.assert_non_empty(ros_variants, f"No ROS variants found in the file '{ros_variants_yaml_file}'")
 
-        if ros_distro in ros_variants:
-            self._ros_variant = ros_variants[ros_distro]
-        else:
+        ros_variant = ros_variants.get(ros_distro)
+
+        if ros_variant is None:
             supported_ros_distros = ", ".join(
-                f"{ros_distro} (ros{data['ros_version']})" for ros_distro, data in ros_variants.items()
+                f"{supported_distro} (ros{data['ros_version']})" for supported_distro, data in ros_variants.items()
             )
             raise Exception(f"Found ROS distro '{ros_distro}'. Allowed ROS distros: {supported_ros_distros}")
 
+        # The entry is converted once to a frozen dataclass, so the getters are plain attribute reads. The ROS version
+        # is stored as an int, since it is compared with 1 and 2 by the callers, and the rest of fields as strings.
+        try:
+            self._ros_variant = _Variant(
+                ros_distro=str(ros_variant['ros_distro']),
+                ros_version=int(ros_variant['ros_version']),
+                ubuntu_version=str(ros_variant['ubuntu_version']),
+                python_version=str(ros_variant['python_version']),
+                c_version=str(ros_variant['c_version']),
+                cpp_version=str(ros_variant['cpp_version']),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise Exception(
+                f"Invalid entry for the ROS distro '{ros_distro}' in the file '{ros_variants_yaml_file.resolve()}': {e}"
+            ) from None
+
     def get_c_version(self) -> str:
         """
         Returns the C version associated with the ROS variant.
         Returns:
             str: The C version.
         """
-        return self._ros_variant["c_version"]
+        return self._ros_variant.c_version
 
     def get_cpp_version(self) -> str:
         """
@@ -41,7 +70,7 @@ class RosVariant:
         Returns:
             str: The C++ version.
         """
-        return self._ros_variant["cpp_version"]
+        return self._ros_variant.cpp_version
 
     def get_distro(self) -> str:
         """
@@ -49,7 +78,7 @@ class RosVariant:
         Returns:
             str: The ROS distro.
         """
-        return self._ros_variant["ros_distro"]
+        return self._ros_variant.ros_distro
 
     def get_ubuntu_version(self) -> str:
         """
@@ -57,15 +86,15 @@ class RosVariant:
         Returns:
             str: The Ubuntu distro
         """
-        return self._ros_variant["ubuntu_version"]
+        return self._ros_variant.ubuntu_version
 
-    def get_version(self) -> str:
+    def get_version(self) -> int:
         """
         Returns the ROS version.
         Returns:
-            str: The ROS version.
+            int: The ROS version (1 or 2).
         """
-        return self._ros_variant["ros_version"]
+        return self._ros_variant.ros_version
 
     def get_python_version(self) -> str:
         """
@@ -73,4 +102,4 @@ class RosVariant:
         Returns:
             str: The Python version (e.g., '3.8', '3.10', '3.12').
         """
-        return self._ros_variant["python_version"]
+        return self._ros_variant.python_version
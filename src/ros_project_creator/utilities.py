@@ -1,11 +1,225 @@
 #!/usr/bin/env python3
+from collections import OrderedDict
+import copy
+import functools
+import mmap
+import os
 from pathlib import Path
-import re
 import shutil
-from typing import Callable, Optional
-import yaml
+import stat
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple, Union
 
-from jinja2 import Environment
+# yaml and jinja2 are imported where they are used, so importing this module (e.g. to show the help message of the
+# command line tools) doesn't pay for loading them.
+if TYPE_CHECKING:
+    from jinja2 import Environment, Template
+
+# The resources shipped with the package, shared by the project creators and their command line tools. Their location
+# doesn't change while the process runs, so the paths are built once.
+RESOURCES_DIR = Path(__file__).parent.joinpath('resources')
+ROS_VARIANTS_YAML_FILE = RESOURCES_DIR.joinpath('ros', 'ros_variants.yaml')
+
+# Files bigger than this size are copied from a read-only memory map of the source file. Smaller files are copied with
+# plain read/write calls, using a buffer of this size.
+_MMAP_COPY_THRESHOLD = 64 * 1024
+
+# Size of the slices of the memory map written on each write call.
+_MMAP_COPY_CHUNK_SIZE = 1024 * 1024
+
+# Functions that copy data between two file descriptors inside the kernel, without going through userspace buffers,
+# in order of preference. All of them take (src_fd, dst_fd, count) and return the number of bytes copied.
+_KERNEL_COPY_FUNCTIONS: List[Callable[[int, int, int], int]] = []
+
+if hasattr(os, 'copy_file_range'):
+    _KERNEL_COPY_FUNCTIONS.append(lambda src_fd, dst_fd, count: os.copy_file_range(src_fd, dst_fd, count))
+
+if hasattr(os, 'sendfile'):
+    _KERNEL_COPY_FUNCTIONS.append(lambda src_fd, dst_fd, count: os.sendfile(dst_fd, src_fd, None, count))
+
+
+def _fast_copytree(src: Path, dst: Path, mode: Optional[int] = None) -> None:
+    """
+    Copies the directory tree src into dst, creating dst and merging with its content if it already exists.
+
+    Only the content and the permissions of files and directories are copied, not their timestamps, flags or extended
+    attributes as shutil.copytree does, which saves several syscalls per entry. The files are copied with
+    Utilities.copy_file_fast. Symlinks are followed, as in shutil.copytree with symlinks=False.
+
+    Args:
+        src (Path): The directory to copy.
+        dst (Path): The destination directory.
+        mode (Optional[int]): The permissions of dst, or None to leave them as they are.
+    """
+    os.makedirs(dst, exist_ok=True)
+
+    if mode is not None:
+        os.chmod(dst, mode)
+
+    with os.scandir(src) as entries:
+        for entry in entries:
+            # The type of the entry is known from the directory listing, only its permissions require a stat().
+            entry_mode = stat.S_IMODE(entry.stat().st_mode)
+
+            if entry.is_dir():
+                _fast_copytree(Path(entry.path), dst.joinpath(entry.name), entry_mode)
+            else:
+                Utilities.copy_file_fast(Path(entry.path), dst.joinpath(entry.name), entry_mode)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_yaml_loader() -> type:
+    # The libyaml based loader parses in C and is much faster than the pure Python one. PyYAML only provides it when it
+    # was built with libyaml (as its binary wheels are), otherwise fall back to the pure Python loader.
+    try:
+        from yaml import CSafeLoader
+
+        return CSafeLoader
+    except ImportError:
+        from yaml import SafeLoader
+
+        return SafeLoader
+
+
+@functools.lru_cache(maxsize=None)
+def _get_bytecode_cache_class() -> type:
+    # The class is created on the first call, as Jinja2 is only imported when a template is rendered.
+    from jinja2 import FileSystemBytecodeCache
+
+    class _BestEffortBytecodeCache(FileSystemBytecodeCache):
+        """
+        A FileSystemBytecodeCache whose I/O errors are ignored.
+
+        The cache only saves the compilation of the templates, so if its directory can't be read or written (e.g. a
+        read-only home, a full disk or a directory owned by another user), the templates are compiled in memory, as if
+        there was no cache, instead of failing the render.
+        """
+
+        def load_bytecode(self, bucket) -> None:
+            try:
+                super().load_bytecode(bucket)
+            except OSError:
+                bucket.reset()
+
+        def dump_bytecode(self, bucket) -> None:
+            try:
+                super().dump_bytecode(bucket)
+            except OSError:
+                pass
+
+    return _BestEffortBytecodeCache
+
+
+# Parsed YAML files, keyed by (st_dev, st_ino) of the file, with the (st_mtime_ns, st_size) they were parsed at. The
+# least recently used entry is evicted when the cache is full.
+_YAML_CACHE: 'OrderedDict[Tuple[int, int], Tuple[int, int, dict]]' = OrderedDict()
+_YAML_CACHE_MAX_SIZE = 64
+
+# Characters allowed in each part of a Docker image name, [HOST[:PORT_NUMBER]/]PATH[:TAG].
+_DOCKER_ALNUM_CHARS = frozenset('abcdefghijklmnopqrstuvwxyz0123456789')
+_DOCKER_HOST_CHARS = _DOCKER_ALNUM_CHARS | frozenset('.-')
+_DOCKER_PORT_CHARS = frozenset('0123456789')
+_DOCKER_PATH_COMPONENT_CHARS = _DOCKER_ALNUM_CHARS | frozenset('._-')
+_DOCKER_TAG_CHARS = _DOCKER_PATH_COMPONENT_CHARS | frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+# A separator inside a path component can only be a single dot, one or two underscores or one or more dashes. Given
+# the allowed characters, a run of separators is invalid if and only if it contains one of these substrings.
+_DOCKER_INVALID_SEPARATORS = ('..', '___', '.-', '-.', '._', '_.', '-_', '_-')
+
+
+def _is_valid_docker_path_component(component: str) -> bool:
+    # A path component must start and end with an alphanumeric character, separators are allowed only between
+    # alphanumerics.
+    return (
+        component != ''
+        and component[0] in _DOCKER_ALNUM_CHARS
+        and component[-1] in _DOCKER_ALNUM_CHARS
+        and set(component) <= _DOCKER_PATH_COMPONENT_CHARS
+        and not any(separator in component for separator in _DOCKER_INVALID_SEPARATORS)
+    )
+
+
+def _is_valid_docker_host(host: str) -> bool:
+    # Host made of lowercase letters, digits, dots and dashes, with an optional :PORT.
+    host, colon, port = host.partition(':')
+
+    if colon and (port == '' or not set(port) <= _DOCKER_PORT_CHARS):
+        return False
+
+    return host != '' and set(host) <= _DOCKER_HOST_CHARS
+
+
+def _validate_docker_image_name(name: str) -> bool:
+    """
+    Validates a Docker image name, [HOST[:PORT_NUMBER]/]PATH[:TAG], in a single left to right pass per part.
+
+    The parts are split at fixed separators, instead of matching the whole name with a backtracking regex: the tag can
+    only follow the last '/', and the first segment of the remaining name is either the first path component or, if it
+    isn't a valid one, the registry host. Each check is a set inclusion or a substring search, so the validation runs
+    in linear time on any input.
+    """
+    # The former regex ended in '$', which also matches before a trailing newline, so keep accepting it.
+    if name.endswith('\n'):
+        name = name[:-1]
+
+    # Optional TAG: colon + letters, digits, '_', '.' or '-', after the last '/'.
+    last_slash = name.rfind('/')
+    colon = name.find(':', last_slash + 1)
+
+    if colon != -1:
+        tag = name[colon + 1 :]
+
+        if tag == '' or not set(tag) <= _DOCKER_TAG_CHARS:
+            return False
+
+        name = name[:colon]
+
+    # PATH = one or more components separated by '/', optionally prefixed with 'HOST[:PORT]/'.
+    segments = name.split('/')
+
+    if not all(_is_valid_docker_path_component(segment) for segment in segments[1:]):
+        return False
+
+    return _is_valid_docker_path_component(segments[0]) or (len(segments) > 1 and _is_valid_docker_host(segments[0]))
+
+
+def _copy_in_kernel(src_fd: int, dst_fd: int, size: int) -> bool:
+    """
+    Copies size bytes from src_fd to dst_fd with the first kernel copy function that works for the pair of files.
+
+    Returns:
+        bool: False if no kernel copy function could be used, so the caller must copy the data itself.
+    Raises:
+        OSError: If a kernel copy function fails, or stops early, after some data has been copied.
+    """
+    for kernel_copy in _KERNEL_COPY_FUNCTIONS:
+        copied = 0
+
+        try:
+            while copied < size:
+                n = kernel_copy(src_fd, dst_fd, size - copied)
+
+                if n == 0:
+                    break
+
+                copied += n
+        except OSError:
+            # The function is not supported for these files (e.g. EXDEV, ENOSYS, EINVAL). Another method can only be
+            # tried if nothing has been copied yet.
+            if copied:
+                raise
+
+            continue
+
+        if copied == size:
+            return True
+
+        # Some filesystems and kernels return 0 from copy_file_range() for regular files they can't copy, instead of an
+        # error. If nothing has been copied, the next method is tried. Otherwise the file can't be completed from where
+        # the copy stopped, and a short copy must not be taken as a success.
+        if copied:
+            raise OSError(f'Short copy: only {copied} of {size} bytes were copied')
+
+    return False
 
 
 class Utilities:
@@ -72,27 +286,111 @@ class Utilities:
         Returns:
             str: The cleaned string or None if the input was None.
         """
+        # str.strip() already returns the same object, without allocating a new one, when there is nothing to strip.
         return string.strip() if string is not None else None
 
+    @staticmethod
+    def clear_yaml_cache() -> None:
+        """Empties the cache of the YAML files loaded with Utilities.load_yaml."""
+        _YAML_CACHE.clear()
+
     @staticmethod
     def copy_file(src: Path, dst: Path, mode: int, log: Optional[Callable[[str], None]] = None) -> None:
         if log:
-            log(f"Creating file '{dst.resolve()}'...")
+            log(f"Creating file '{os.path.abspath(dst)}'...")
 
         shutil.copy(src, dst)
         dst.chmod(mode)
 
+    @staticmethod
+    def copy_file_fast(src: Path, dst: Path, mode: int) -> None:
+        """
+        Copies the content of a file, but not its metadata, and sets the permissions of the copy.
+
+        The data is copied inside the kernel with os.copy_file_range or os.sendfile when the platform supports it.
+        Otherwise, files bigger than _MMAP_COPY_THRESHOLD are memory-mapped and written in slices of
+        _MMAP_COPY_CHUNK_SIZE bytes, and smaller files are copied with plain read/write calls.
+
+        Args:
+            src (Path): The file to copy.
+            dst (Path): The destination file. It is created or truncated.
+            mode (int): The permissions of the destination file.
+        """
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            src_fd = fsrc.fileno()
+            dst_fd = fdst.fileno()
+            size = os.fstat(src_fd).st_size
+
+            if not _copy_in_kernel(src_fd, dst_fd, size):
+                if size > _MMAP_COPY_THRESHOLD:
+                    with mmap.mmap(src_fd, 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                        for offset in range(0, size, _MMAP_COPY_CHUNK_SIZE):
+                            fdst.write(view[offset : offset + _MMAP_COPY_CHUNK_SIZE])
+                else:
+                    shutil.copyfileobj(fsrc, fdst, _MMAP_COPY_THRESHOLD)
+
+            # Setting the mode on the open file descriptor saves the path lookup of a later chmod.
+            os.fchmod(dst_fd, mode)
+
     @staticmethod
     def copy_dir(src: Path, dst: Path, mode: int, log: Optional[Callable[[str], None]] = None) -> None:
         if log:
-            log(f"Creating directory '{dst.resolve()}'...")
+            log(f"Creating directory '{os.path.abspath(dst)}'...")
 
-        shutil.copytree(src, dst, dirs_exist_ok=True)
-        dst.chmod(mode)
+        if os.name == 'posix':
+            _fast_copytree(src, dst, mode)
+        else:
+            shutil.copytree(src, dst, dirs_exist_ok=True)
+            dst.chmod(mode)
+
+    # One Jinja2 environment is shared by all the renders over the same templates directory and options, so every
+    # template is loaded and compiled only once, and then served from the environment's cache.
+    @staticmethod
+    @functools.lru_cache(maxsize=16)
+    def get_jinja_env(templates_dir: str, trim_blocks: bool = True, lstrip_blocks: bool = True) -> 'Environment':
+        """
+        Returns the shared Jinja2 environment that loads templates from the given directory.
+
+        Args:
+            templates_dir (str): Directory the template names are relative to.
+            trim_blocks (bool): If True, remove the first newline after a block (e.g., after {% endif %}).
+            lstrip_blocks (bool): If True, strip the leading whitespace from the start of a block line.
+        Returns:
+            Environment: The Jinja2 environment, created on the first call for the given arguments.
+        """
+        from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+        # The compiled templates are also stored in the user's cache dir, so later runs of the tool load their bytecode
+        # instead of parsing and compiling them again. Jinja2 checks the checksum of the template source before using
+        # a cached entry, so modified templates are compiled again. If the cache dir can't be created, or can't be read
+        # or written later, the templates are only compiled in memory.
+        bytecode_cache = None
+        cache_home = Path(os.getenv('XDG_CACHE_HOME') or Path.home().joinpath('.cache'))
+        cache_dir = cache_home.joinpath('ros_project_creator', 'jinja')
+
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            pass
+        else:
+            bytecode_cache = _get_bytecode_cache_class()(str(cache_dir))
+
+        # auto_reload is disabled because the templates ship with the package and don't change at runtime, so there is
+        # no need to check their modification time each time they are requested.
+        # StrictUndefined makes a variable missing from the context an error, instead of silently rendering it as ''.
+        return Environment(
+            loader=FileSystemLoader(templates_dir),
+            trim_blocks=trim_blocks,
+            lstrip_blocks=lstrip_blocks,
+            undefined=StrictUndefined,
+            auto_reload=False,
+            cache_size=400,
+            bytecode_cache=bytecode_cache,
+        )
 
     @staticmethod
     def install_template(
-        jinja_env: Environment,
+        jinja_env: 'Environment',
         template: Path,
         context: dict,
         output_file: Path,
@@ -100,12 +398,61 @@ class Utilities:
         log: Optional[Callable[[str], None]] = None,
     ) -> None:
         if log:
-            log(f"Creating file '{output_file.resolve()}'...")
+            log(f"Creating file '{os.path.abspath(output_file)}'...")
 
         rendered = Utilities.render_template(jinja_env, template, context)
         Utilities.write_file(rendered, output_file)
         output_file.chmod(mode)
 
+    @staticmethod
+    def install_template_streamed(
+        jinja_env: 'Environment',
+        template: Union[str, 'Template'],
+        context: dict,
+        output_file: Path,
+        mode: int,
+        log: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        """
+        Renders a template into a file, like install_template, but writing the output while it is rendered.
+
+        The rendered text is never held in memory as a whole, Jinja2 yields it in chunks that are written to the file.
+
+        Args:
+            jinja_env (Environment): The environment that loads the template.
+            template (Union[str, Template]): The name of the template in the loader of jinja_env (e.g.
+                'vscode/tasks.j2'), or a template already loaded from it.
+            context (dict): The variables available to the template.
+            output_file (Path): The file to create.
+            mode (int): The permissions of the created file.
+            log (Optional[Callable[[str], None]]): Function used to log the file creation, if any.
+
+        Raises:
+            Exception: If the output file already exists, or if the template can't be rendered, in which case no file
+                is left behind.
+        """
+        if log:
+            log(f"Creating file '{os.path.abspath(output_file)}'...")
+
+        template = jinja_env.get_template(template)
+
+        # The file is created exclusively, which fails if it already exists, instead of checking it with a stat() first.
+        try:
+            f = open(output_file, 'x', encoding='utf-8')
+        except FileExistsError:
+            raise Exception(f"File '{output_file}' already exists") from None
+
+        # If the rendering fails (e.g. an undefined variable), the part of the file written so far is removed, so no
+        # truncated file is left behind.
+        try:
+            with f:
+                template.stream(context).dump(f)
+        except Exception:
+            output_file.unlink(missing_ok=True)
+            raise
+
+        output_file.chmod(mode)
+
     @staticmethod
     def is_valid_docker_image_name(name: str) -> bool:
         """
@@ -117,44 +464,52 @@ class Utilities:
         See: https://docs.docker.com/get-started/docker-concepts/building-images/build-tag-and-publish-an-image/#tagging-images
         """
 
-        # Optional registry prefix: host (lower‑case letters, digits, dots, dashes)
-        # with optional :PORT, followed by a slash.
-        host_and_port_prefix = r"([a-z0-9.-]+(:[0-9]+)?/)?"
-
-        # A separator inside a path component can be:
-        #   • a single dot
-        #   • one or two underscores
-        #   • one or more dashes
-        path_separator = r"(?:\.|_{1,2}|-+)"
+        return _validate_docker_image_name(name)
 
-        # A path component must start and end with an alphanumeric character,
-        # separators are allowed only between alphanumerics.
-        path_component = rf"[a-z0-9]+(?:{path_separator}[a-z0-9]+)*"
+    @staticmethod
+    def load_yaml(file: Path) -> dict:
+        """
+        Loads a YAML file whose top level is a mapping.
 
-        # PATH = one or more components separated by '/'
-        path_re = rf"{path_component}(/{path_component})*"
+        The parsed content is cached, so a file loaded again while its modification time and size don't change is not
+        read nor parsed again. Each call returns its own copy of the content, so the caller can modify it. The cache
+        can be emptied with Utilities.clear_yaml_cache().
 
-        # Optional TAG: colon + allowed characters (letters, digits, '_', '.', '-')
-        tag_re = r"(:[a-zA-Z0-9_.-]+)?"
+        Args:
+            file (Path): The YAML file to load.
+        Returns:
+            dict: The content of the file, or an empty dict if the file doesn't exist, isn't valid YAML or its top level
+            isn't a mapping.
+        """
+        import yaml
 
-        # Full regex combining all parts
-        full_re = re.compile(rf"^{host_and_port_prefix}{path_re}{tag_re}$")
+        try:
+            file_stat = os.stat(file)
+            key = (file_stat.st_dev, file_stat.st_ino)
+            cached = _YAML_CACHE.get(key)
 
-        return bool(full_re.match(name))
+            if cached is not None and cached[:2] == (file_stat.st_mtime_ns, file_stat.st_size):
+                _YAML_CACHE.move_to_end(key)
+                return copy.deepcopy(cached[2])
 
-    @staticmethod
-    def load_yaml(file: Path) -> dict:
-        try:
             with open(file, "r") as f:
-                content = yaml.safe_load(f)
-                return content if isinstance(content, dict) else {}
+                content = yaml.load(f, Loader=_get_yaml_loader())
+                content = content if isinstance(content, dict) else {}
         except (FileNotFoundError, yaml.YAMLError):
             return {}
 
+        _YAML_CACHE[key] = (file_stat.st_mtime_ns, file_stat.st_size, content)
+        _YAML_CACHE.move_to_end(key)
+
+        if len(_YAML_CACHE) > _YAML_CACHE_MAX_SIZE:
+            _YAML_CACHE.popitem(last=False)
+
+        return copy.deepcopy(content)
+
     @staticmethod
     def mkdir(dir: Path, mode: int, log: Optional[Callable[[str], None]] = None) -> None:
         if log:
-            log(f"Creating directory '{dir.resolve()}'...")
+            log(f"Creating directory '{os.path.abspath(dir)}'...")
 
         dir.mkdir(parents=True, exist_ok=True)
         dir.chmod(mode)
@@ -178,13 +533,11 @@ class Utilities:
         if file.is_dir():
             raise Exception(f"Path '{file}' is a directory, not a file")
 
-        with file.open("r") as f:
-            text = f.read()
-
-        return text
+        # The files are UTF-8 encoded, so don't depend on the encoding of the locale.
+        return file.read_text(encoding='utf-8')
 
     @staticmethod
-    def render_template(jinja_env: Environment, template: Path, context: dict) -> str:
+    def render_template(jinja_env: 'Environment', template: Path, context: dict) -> str:
         jinja_template = jinja_env.get_template(template.name)
         return jinja_template.render(context)
 
@@ -206,5 +559,5 @@ class Utilities:
         if file.exists():
             raise Exception(f"File '{file}' already exists")
 
-        with file.open("w") as f:
-            f.write(text)
+        file.write_text(text, encoding='utf-8')
+
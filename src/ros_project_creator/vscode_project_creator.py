@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
 
 import os
-import shutil
-from pathlib import Path
-
-from jinja2 import Environment, FileSystemLoader
+import stat
+from pathlib import Path, PurePath, PurePosixPath
+from typing import Optional
 
 from ros_project_creator.colorizedlogs import ColorizedLogger
+from ros_project_creator.install_items import RenderTemplate, install_concurrently
 from ros_project_creator.ros_variant import RosVariant
-from ros_project_creator.utilities import Utilities
+from ros_project_creator.utilities import RESOURCES_DIR, ROS_VARIANTS_YAML_FILE, Utilities
+
+# Ids of the user running the tool, passed to the container so the files it creates in the workspace are owned by the
+# same user on the host. They don't change while the process runs, so they are read once.
+_EXT_UID = str(os.getuid())
+_EXT_UPGID = str(os.getgid())
 
 
 class VscodeProjectCreatorException(Exception):
@@ -18,6 +23,23 @@ class VscodeProjectCreatorException(Exception):
 
 
 class VscodeProjectCreator:
+    # Commands of the VSCode tasks for each ROS version: build for release, build for debug, build for release with
+    # debug info and clean.
+    _TASK_CMDS = {
+        1: (
+            'rosbuild.sh',
+            'rosbuild.sh --cmake-args -DCMAKE_BUILD_TYPE=Debug',
+            'rosbuild.sh --cmake-args -DCMAKE_BUILD_TYPE=RelWithDebInfo',
+            'catkin clean --yes --verbose --force',
+        ),
+        2: (
+            'rosbuild.sh',
+            'rosbuild.sh --mixin debug',
+            'rosbuild.sh --mixin rel-with-deb-info',
+            'colcon clean workspace -y',
+        ),
+    }
+
     # ==========================================================================
     # non-static private methods
     # ==========================================================================
@@ -28,9 +50,9 @@ class VscodeProjectCreator:
         ros_distro: str,
         img_id: str,
         img_user: str,
-        img_user_home: Path,
+        img_user_home: PurePath,
         workspace_dir: Path,
-        img_workspace_dir: Path,
+        img_workspace_dir: PurePath,
         use_host_nvidia_driver: bool = False,
         use_console_log: bool = True,
         log_file: str = '',
@@ -41,9 +63,9 @@ class VscodeProjectCreator:
             ros_distro (str): ROS distro to use (e.g. 'humble')
             img_id (str): ID of the Docker image that VSCode will use to create a container
             img_user (str): User to use inside the container
-            img_user_home (Path): Home directory of the user inside the container (e.g. '/home/user')
+            img_user_home (PurePath): Home directory of the user inside the container (e.g. '/home/user')
             workspace_dir (Path): Path to the project directory (e.g. '/path/to/robproj')
-            img_workspace_dir (Path): Path to the workspace in the image (e.g. '/home/user/workspaces/robproj')
+            img_workspace_dir (PurePath): Path to the workspace in the image (e.g. '/home/user/workspaces/robproj')
             use_host_nvidia_driver (bool): If True, use the host's NVIDIA driver. Default is False.
             use_console_log (bool): If True, log to console. Default is True.
             log_file (str): File to log output. Default is "" (no file).
@@ -64,16 +86,21 @@ class VscodeProjectCreator:
         )
         try:
             # Check the resource dir exits.
-            self._resources_dir = Path(__file__).parent.joinpath('resources')
+            self._resources_dir = RESOURCES_DIR
             Utilities.assert_dir_existence(self._resources_dir, f"Path '{str(self._resources_dir)}' is required")
 
+            # A single environment over the resources dir renders all the templates, referenced by their path relative
+            # to the resources dir. It is created by the first creator that needs it and then shared by all the
+            # creators in the process, also by RosProjectCreator, so a template used by both (e.g. docker-compose.j2)
+            # is compiled only once.
+            self._jinja_env = Utilities.get_jinja_env(str(self._resources_dir))
+
             self._project_id = Utilities.clean_str(project_id)
             Utilities.assert_non_empty(project_id, 'Project id must be a non-empty string')
 
             # Get the the ros_variant (ros_distro, ros_version, cpp_version, c_version) associated to the passed
             # ros_distro.
-            ros_variant_yaml_file = self._resources_dir.joinpath('ros/ros_variants.yaml')
-            self._ros_variant = RosVariant(ros_distro, ros_variant_yaml_file)
+            self._ros_variant = RosVariant(ros_distro, ROS_VARIANTS_YAML_FILE)
 
             self._img_id = Utilities.clean_str(img_id)
             Utilities.assert_non_empty(img_id, 'Image id must be a non-empty string')
@@ -87,13 +114,17 @@ class VscodeProjectCreator:
             if not img_user_home:
                 raise Exception('Image user home path must be provided')
 
-            if not img_user_home.is_absolute():
-                raise Exception('Image user home path must be an absolute path')
+            # The paths inside the image are POSIX paths, whatever the host is, and they are never accessed from the
+            # host, so they are handled as pure paths, which don't touch the filesystem.
+            self._img_user_home = PurePosixPath(img_user_home)
 
-            self._img_user_home = img_user_home
+            if not self._img_user_home.is_absolute():
+                raise Exception('Image user home path must be an absolute path')
 
+            # The paths inside the image only depend on the home of the image user, so they are computed once here.
             self._img_datasets_dir = self._img_user_home.joinpath('datasets')
             self._img_ssh_dir = self._img_user_home.joinpath('.ssh')
+            self._img_gitconfig_file = self._img_user_home.joinpath('.gitconfig')
 
             # The workspace_dir field can't be None. It does not matter if it is an absolute or
             # relative path, i.e., as long as the user provides a path. It is the responsibility
@@ -108,211 +139,197 @@ class VscodeProjectCreator:
             if not img_workspace_dir:
                 raise Exception('Image workspace path must be provided')
 
-            if not img_workspace_dir.is_absolute():
-                raise Exception('Image workspace path must be an absolute path')
+            self._img_workspace_dir = PurePosixPath(img_workspace_dir)
 
-            self._img_workspace_dir = img_workspace_dir
+            if not self._img_workspace_dir.is_absolute():
+                raise Exception('Image workspace path must be an absolute path')
             self._use_host_nvidia_driver = use_host_nvidia_driver
 
             # Get git config for the user running the project configuration tool and write it to the docker-compose
             # file, in the volumes section.
             home = Path.home()
-            global_gitconfig_file = home.joinpath('.gitconfig')
-            xdg_gitconfig_file = home.joinpath('.config/git/config')
-
-            # Check ~/.gitconfig first, as it has higher priority.
-            if global_gitconfig_file.is_file():
-                self._use_git = True
-                self._gitconfig_file = global_gitconfig_file
-            # If not found, check ~/.config/git/config (lower priority)
-            elif xdg_gitconfig_file.is_file():
-                self._use_git = True
-                self._gitconfig_file = xdg_gitconfig_file
+
+            # Check ~/.gitconfig first, as it has higher priority, and then ~/.config/git/config. Each candidate costs
+            # a single stat().
             # If no gitconfig file is found, remove the git_config block from the docker-compose file.
-            else:
-                self._use_git = False
-                self._gitconfig_file = None
-
-            if self._ros_variant.get_version() == 1:
-                self._build_release_cmd = 'rosbuild.sh'
-                self._build_debug_cmd = 'rosbuild.sh --cmake-args -DCMAKE_BUILD_TYPE=Debug'
-                self._build_relwithdebinfo_cmd = 'rosbuild.sh --cmake-args -DCMAKE_BUILD_TYPE=RelWithDebInfo'
-                self._clean_cmd = 'catkin clean --yes --verbose --force'
-            else:
-                self._build_release_cmd = 'rosbuild.sh'
-                self._build_debug_cmd = 'rosbuild.sh --mixin debug'
-                self._build_relwithdebinfo_cmd = 'rosbuild.sh --mixin rel-with-deb-info'
-                self._clean_cmd = 'colcon clean workspace -y'
+            self._use_git = False
+            self._gitconfig_file = None
+
+            for gitconfig_file in (home.joinpath('.gitconfig'), home.joinpath('.config/git/config')):
+                try:
+                    gitconfig_mode = os.stat(gitconfig_file).st_mode
+                except (FileNotFoundError, NotADirectoryError):
+                    continue
+
+                if stat.S_ISREG(gitconfig_mode):
+                    self._use_git = True
+                    self._gitconfig_file = gitconfig_file
+                    break
+
+            (self._build_release_cmd, self._build_debug_cmd, self._build_relwithdebinfo_cmd, self._clean_cmd) = (
+                self._TASK_CMDS[self._ros_variant.get_version()]
+            )
 
             self._install_items()
         # trim_block removes the first newline after a block (e.g., after {% endif %}).
         # lstrip_blocks strips leading whitespace from the start of a block line.
         except Exception as e:
-            self._logger.error(f'{e}')
+            self._logger.error('%s', e)
             raise
 
     def _create_items_to_install(self) -> None:
+        # The values shared by several templates are read once. They are passed in the context of each template, not
+        # as globals of the Jinja2 environment, because the environment is shared by all the creators in the process.
         service = 'devcont'
-
-        self._items_to_install = {
-            '.devcontainer/devcontainer.json': [
-                'vscode/dot_devcontainer.j2',
-                {'service': service, 'img_user': self._img_user, 'img_workspace_dir': self._img_workspace_dir},
-                False,
-            ],
-            '.devcontainer/docker-compose.yaml': [
-                'docker/docker-compose.j2',
-                {
-                    'service': service,
-                    'img_id': self._img_id,
-                    'use_host_nvidia_driver': self._use_host_nvidia_driver,
-                    'workspace_dir': self._workspace_dir,
-                    'img_workspace_dir': self._img_workspace_dir,
-                    'img_datasets_dir': self._img_datasets_dir,
-                    'img_ssh_dir': self._img_ssh_dir,
-                    'use_git': self._use_git,
-                    'gitconfig_file': self._gitconfig_file,
-                    'img_gitconfig_file': self._img_user_home.joinpath('.gitconfig'),
-                    'ext_uid': f'{os.getuid()}',
-                    'ext_upgid': f'{os.getgid()}',
-                    'ros_version': self._ros_variant.get_version(),
-                    'ros_distro': self._ros_variant.get_distro(),
-                },
-                True,
-            ],
-            '.vscode/c_cpp_properties.json': [
-                'vscode/c_cpp_properties.j2',
-                {
-                    'c_version': f'c{self._ros_variant.get_c_version()}',
-                    'cpp_version': f'c++{self._ros_variant.get_cpp_version()}',
-                    'ros_distro': self._ros_variant.get_distro(),
-                },
-                False,
-            ],
-            '.vscode/tasks.json': [
-                'vscode/tasks.j2',
-                {
-                    'build_command_for_release': self._build_release_cmd,
-                    'build_command_for_debug': self._build_debug_cmd,
-                    'build_command_for_relwithdebinfo': self._build_relwithdebinfo_cmd,
-                    'clean_command': self._clean_cmd,
-                },
-                True,
-            ],
-            'ws.code-workspace': [
-                'vscode/ws.j2',
-                {
-                    'project_id': self._project_id,
-                    'ros_distro': self._ros_variant.get_distro(),
-                    'python_version': self._ros_variant.get_python_version(),
-                },
-                False,
-            ],
-        }
+        ros_distro = self._ros_variant.get_distro()
+
+        # The paths are passed to the templates as strings, as RosProjectCreator does, each one converted only once.
+        img_workspace_dir = str(self._img_workspace_dir)
+
+        # The items are listed sorted by the path they are installed to, relative to the workspace directory, so they
+        # are installed in this order without sorting them, and a directory is installed before the items inside it.
+        # Each item is a tuple whose first element is that path and whose second element is the RenderTemplate the
+        # file is rendered from, as in RosProjectCreator. All the VSCode files are rendered from templates.
+        self._items_to_install = [
+            (
+                '.devcontainer/devcontainer.json',
+                RenderTemplate(
+                    'vscode/dot_devcontainer.j2',
+                    {'service': service, 'img_user': self._img_user, 'img_workspace_dir': img_workspace_dir},
+                    False,
+                ),
+            ),
+            (
+                '.devcontainer/docker-compose.yaml',
+                RenderTemplate(
+                    'docker/docker-compose.j2',
+                    {
+                        'service': service,
+                        'img_id': self._img_id,
+                        'use_host_nvidia_driver': self._use_host_nvidia_driver,
+                        'workspace_dir': str(self._workspace_dir),
+                        'img_workspace_dir': img_workspace_dir,
+                        'img_datasets_dir': str(self._img_datasets_dir),
+                        'img_ssh_dir': str(self._img_ssh_dir),
+                        'use_git': self._use_git,
+                        'gitconfig_file': str(self._gitconfig_file) if self._use_git else None,
+                        'img_gitconfig_file': str(self._img_gitconfig_file),
+                        'ext_uid': _EXT_UID,
+                        'ext_upgid': _EXT_UPGID,
+                        'ros_version': self._ros_variant.get_version(),
+                        'ros_distro': ros_distro,
+                    },
+                    True,
+                ),
+            ),
+            (
+                '.vscode/c_cpp_properties.json',
+                RenderTemplate(
+                    'vscode/c_cpp_properties.j2',
+                    {
+                        'c_version': f'c{self._ros_variant.get_c_version()}',
+                        'cpp_version': f'c++{self._ros_variant.get_cpp_version()}',
+                        'ros_distro': ros_distro,
+                    },
+                    False,
+                ),
+            ),
+            (
+                '.vscode/tasks.json',
+                RenderTemplate(
+                    'vscode/tasks.j2',
+                    {
+                        'build_command_for_release': self._build_release_cmd,
+                        'build_command_for_debug': self._build_debug_cmd,
+                        'build_command_for_relwithdebinfo': self._build_relwithdebinfo_cmd,
+                        'clean_command': self._clean_cmd,
+                    },
+                    True,
+                ),
+            ),
+            (
+                'ws.code-workspace',
+                RenderTemplate(
+                    'vscode/ws.j2',
+                    {
+                        'project_id': self._project_id,
+                        'ros_distro': ros_distro,
+                        'python_version': self._ros_variant.get_python_version(),
+                    },
+                    False,
+                ),
+            ),
+        ]
+
+    def _assert_resource_files_existence(self) -> None:
+        # The source files of the items are checked by listing each resources subdirectory once, instead of calling
+        # stat() on every file. A directory entry already tells whether it is a regular file (only symlinks need a
+        # stat() to be followed).
+        files_by_dir = {}
+
+        for _, item in self._items_to_install:
+            src_path = self._resources_dir.joinpath(item.src)
+            files = files_by_dir.get(src_path.parent)
+
+            if files is None:
+                try:
+                    with os.scandir(src_path.parent) as entries:
+                        files = {entry.name for entry in entries if entry.is_file()}
+                except FileNotFoundError:
+                    files = set()
+
+                files_by_dir[src_path.parent] = files
+
+            if src_path.name not in files:
+                raise VscodeProjectCreatorException(f"Required resource file '{str(src_path)}' does not exist.")
 
     def _install_items(self) -> None:
         self._create_items_to_install()
+        self._assert_resource_files_existence()
 
-        for key in sorted(self._items_to_install.keys()):
-            dst_path = self._workspace_dir.joinpath(key)
+        # All the templates are loaded and compiled before the first file is written, so a broken template is reported
+        # before the workspace is modified, and the install loop only renders them.
+        self._templates = {item.src: self._jinja_env.get_template(item.src) for _, item in self._items_to_install}
+
+        # The items share a few parent directories (e.g. '.devcontainer' and '.vscode'), so the parent directories of
+        # the files are created once each before the loop, shallower directories first, so every makedirs() call only
+        # creates its last component.
+        file_parent_dirs = {self._workspace_dir.joinpath(key).parent for key, _ in self._items_to_install}
+
+        for parent_dir in sorted(file_parent_dirs, key=lambda path: len(path.parts)):
+            os.makedirs(parent_dir, exist_ok=True)
 
-            item = self._items_to_install[key]
+        file_tasks = []
 
-            # If the item[0] is None, it means that the key, that can be a file or a directory, must
-            # be created, not copied from a resource.
-            src_path = None
+        for key, item in self._items_to_install:
+            dst_path = self._workspace_dir.joinpath(key)
 
-            if item[0] is not None:
-                src_path = self._resources_dir.joinpath(item[0])
+            # The source files have already been checked.
+            src_path = self._resources_dir.joinpath(item.src)
 
-                if not src_path.exists():
-                    raise VscodeProjectCreatorException(f"Required resource '{str(src_path)}' does not exist.")
+            # Remove the dst_path if it exists, to ensure a clean copy/creation. The unlink() is tried first, as it
+            # costs a single syscall when the path doesn't exist, which is the usual case in a new workspace. Only if it
+            # fails is the path checked for being a directory (Linux fails with EISDIR, other systems with EPERM),
+            # which is removed only if it is empty, as before.
+            try:
+                dst_path.unlink(missing_ok=True)
+            except OSError:
+                if not dst_path.is_dir():
+                    raise
 
-            # Remove the dst_path if it exists, to ensure a clean copy/creation.
-            if dst_path.is_file():
-                dst_path.unlink()
-            elif dst_path.is_dir():
                 dst_path.rmdir()
 
-            # len = 1 -> directory
-            #    src_path is None -> create an empty directory
-            #    src_path is not None -> copy the directory recursively
-            # len = 2 -> file with permissions
-            #    src_path is None -> create an empty file with permissions
-            #    src_path is not None -> copy the file with permissions
-            # len = 3 -> file with Jinja2 rendering and permissions
-            #    src_path is None -> raise an exception, not allowed
-            #    src_path is not None -> copy the file with Jinja2 rendering and permissions
-            if len(item) == 1:
-                self._logger.info(f"Creating directory '{str(dst_path)}'")
-
-                if src_path is not None:
-                    if not src_path.is_dir():
-                        raise VscodeProjectCreatorException(f"Directory '{str(src_path)}' is required")
-
-                    # Create the parent directory if it does not exist.
-                    if not dst_path.parent.exists():
-                        dst_path.parent.mkdir(parents=True)
-
-                    shutil.copytree(src_path, dst_path, copy_function=shutil.copy2)
-                    dst_path.chmod(0o775)
-                else:
-                    # When src_path is None, the key is a directory that must be created.
-                    dst_path.mkdir(parents=True)
-            elif len(item) == 2:
-                self._logger.info(f"Creating file '{str(dst_path)}'")
-
-                if src_path is not None:
-                    if not src_path.is_file():
-                        raise VscodeProjectCreatorException(f"File '{str(src_path)}' is required.")
-
-                    # Create the parent directory if it does not exist.
-                    if not dst_path.parent.exists():
-                        dst_path.parent.mkdir(parents=True)
-
-                    shutil.copy2(src_path, dst_path)
-                else:
-                    # When src_path is None, the key is a file that must be created.
-                    dst_path.touch()
-
-                if item[1]:
-                    dst_path.chmod(0o775)
-                else:
-                    dst_path.chmod(0o664)
-            elif len(item) == 3:
-                self._logger.info(f"Creating file '{dst_path}'")
-
-                if src_path is None:
-                    raise VscodeProjectCreatorException(
-                        f"Relative source path can't be empty for element '{str(dst_path)}'."
-                    )
-
-                if not src_path.is_file():
-                    raise VscodeProjectCreatorException(f"Template '{str(src_path)}' is required.")
-
-                context = item[1]
-
-                if context is None:
-                    raise VscodeProjectCreatorException(
-                        f"Context for Jinja2 rendering can't be None for element '{str(dst_path)}'."
-                    )
-
-                if not isinstance(context, dict):
-                    raise VscodeProjectCreatorException(
-                        f"Context for Jinja2 rendering must be a dictionary for element '{str(dst_path)}'."
-                    )
-
-                if not dst_path.parent.exists():
-                    dst_path.parent.mkdir(parents=True)
-
-                jinja2_env = Environment(loader=FileSystemLoader(src_path.parent), trim_blocks=True, lstrip_blocks=True)
-                jinja2_template = jinja2_env.get_template(src_path.name)
-                rendered_text = jinja2_template.render(context)
-
-                with dst_path.open('w') as f:
-                    f.write(rendered_text)
-
-                if item[2]:
-                    dst_path.chmod(0o775)
-                else:
-                    dst_path.chmod(0o664)
+            # The files are independent from each other, as their parent directories already exist, so they are
+            # installed concurrently afterwards.
+            file_tasks.append((self._install_template, dst_path, src_path, item))
+
+        # The templates are already compiled, so they can be rendered from several threads.
+        install_concurrently(file_tasks)
+
+    def _install_template(self, dst_path: Path, src_path: Optional[Path], item: RenderTemplate) -> None:
+        self._logger.info("Creating file '%s'", dst_path)
+
+        # The template is written to the file while it is rendered.
+        Utilities.install_template_streamed(
+            self._jinja_env, self._templates[item.src], item.context, dst_path, 0o775 if item.executable else 0o664
+        )